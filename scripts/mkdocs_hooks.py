@@ -1,6 +1,7 @@
 # Generate a JSON schema of the Sh handler configuration.
 
 import json
+import os
 from dataclasses import dataclass, fields
 from os.path import join
 from typing import Any
@@ -8,6 +9,10 @@ from typing import Any
 from mkdocs.config.defaults import MkDocsConfig
 from mkdocs.plugins import get_plugin_logger
 
+# Field descriptions for the JSON schema are only attached when Pydantic is enabled.
+# Assign it outright: an empty value would disable Pydantic.
+os.environ["MKDOCSTRINGS_SH_VALIDATE"] = "1"
+
 from mkdocstrings_handlers.sh._internal.config import ShInputConfig, ShInputOptions
 
 # TODO: Update when Pydantic supports Python 3.14 (sources and duties as well).
@@ -2,8 +2,10 @@
 
 from __future__ import annotations
 
+import os
 import sys
 from dataclasses import field
+from functools import lru_cache
 from typing import TYPE_CHECKING, Annotated, Any, Literal
 
 from mkdocstrings import get_logger
@@ -19,9 +21,11 @@ _logger = get_logger(__name__)
 
 
 try:
-    # When Pydantic is available, use it to validate options (done automatically).
-    # Users can therefore opt into validation by installing Pydantic in development/CI.
-    # When building the docs to deploy them, Pydantic is not required anymore.
+    # When Pydantic is available and `MKDOCSTRINGS_SH_VALIDATE` is set, use it to validate options.
+    # Users can therefore opt into validation by installing Pydantic in development/CI and setting the variable.
+    # When building the docs to deploy them, Pydantic is not required anymore, and not even imported.
+    if not os.environ.get("MKDOCSTRINGS_SH_VALIDATE"):
+        raise ImportError
 
     # When building our own docs, Pydantic is always installed (see `docs` group in `pyproject.toml`)
     # to allow automatic generation of a JSON Schema. The JSON Schema is then referenced by mkdocstrings,
@@ -33,7 +37,7 @@ try:
     import pydantic
 
     if getattr(pydantic, "__version__", "1.").startswith("1."):
-        raise ImportError  # noqa: TRY301
+        raise ImportError
 
     # YORE: EOL 3.9: Remove block.
     if sys.version_info < (3, 10):
@@ -52,6 +56,8 @@ try:
     from pydantic import Field as BaseField
     from pydantic.dataclasses import dataclass
 
+    _validate = True
+
     _base_url = "https://mkdocstrings.github.io/mkdocstrings-sh/usage"
 
     def _Field(  # noqa: N802
@@ -78,6 +84,8 @@ try:
 except ImportError:
     from dataclasses import dataclass
 
+    _validate = False
+
     def _Field(*args: Any, **kwargs: Any) -> None:  # type: ignore[misc]  # noqa: N802
         pass
 
@@ -86,14 +94,72 @@ if TYPE_CHECKING:
     from collections.abc import MutableMapping
 
 
+def _freeze(value: Any) -> Any:
+    # Turn (possibly nested) option data into a hashable key.
+    # Types are kept in the key so that e.g. `[1]` and `(1,)` or `1` and `True` do not collide.
+    if isinstance(value, dict):
+        return (dict, frozenset((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return (type(value), tuple(_freeze(item) for item in value))
+    hash(value)
+    return (type(value), value)
+
+
+class _DataKey:
+    # Hashable wrapper around option data, compared by its frozen form.
+    __slots__ = ("data", "key")
+
+    def __init__(self, data: dict[str, Any]) -> None:
+        self.data = data
+        self.key = _freeze(data)
+
+    def __hash__(self) -> int:
+        return hash(self.key)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _DataKey) and self.key == other.key
+
+
+@lru_cache(maxsize=256)
+def _cached_from_data(cls: type, key: _DataKey) -> Any:
+    return cls(**cls.coerce(**key.data))  # type: ignore[attr-defined]
+
+
+_defaults: dict[type, Any] = {}
+
+
+def _from_data(cls: type, data: dict[str, Any]) -> Any:
+    # Instances are frozen, so the same validated instance can be shared
+    # between all calls with equal data. Only frozen fields are protected though:
+    # dictionaries such as `extra` or `options` are shared with the first caller as they are,
+    # which is intended, they are only ever read once passed in.
+    if not data:
+        # Nothing given: skip hashing and validation and return the default instance.
+        default = _defaults.get(cls)
+        if default is None:
+            default = _defaults[cls] = cls(**cls.coerce())  # type: ignore[attr-defined]
+        return default
+    if not _validate:
+        # Without Pydantic, building the instance is cheaper than computing the cache key.
+        return cls(**cls.coerce(**data))  # type: ignore[attr-defined]
+    try:
+        key = _DataKey(data)
+    except TypeError:
+        return cls(**cls.coerce(**data))  # type: ignore[attr-defined]
+    return _cached_from_data(cls, key)
+
+
 # YORE: EOL 3.9: Remove block.
 _dataclass_options = {"frozen": True}
 if sys.version_info >= (3, 10):
     _dataclass_options["kw_only"] = True
+    # `slots=True` recreates the class, which breaks the zero-argument form of `super()`:
+    # subclasses below pass explicit `super` arguments.
+    _dataclass_options["slots"] = True
 
 
 # The input config class is useful to generate a JSON schema, see scripts/mkdocs_hooks.py.
-# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True` within line.
+# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True, slots=True` within line.
 @dataclass(**_dataclass_options)
 class ShInputOptions:
     """Accepted input options."""
@@ -178,10 +244,10 @@ class ShInputOptions:
     @classmethod
     def from_data(cls, **data: Any) -> Self:
         """Create an instance from a dictionary."""
-        return cls(**cls.coerce(**data))
+        return _from_data(cls, data)
 
 
-# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True` within line.
+# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True, slots=True` within line.
 @dataclass(**_dataclass_options)
 class ShOptions(ShInputOptions):  # type: ignore[override,unused-ignore]
     """Final options passed as template context."""
@@ -192,11 +258,11 @@ class ShOptions(ShInputOptions):  # type: ignore[override,unused-ignore]
     def coerce(cls, **data: Any) -> MutableMapping[str, Any]:
         """Create an instance from a dictionary."""
         # Coerce any field into its final form.
-        return super().coerce(**data)
+        return super(ShOptions, cls).coerce(**data)  # noqa: UP008
 
 
 # The input config class is useful to generate a JSON schema, see scripts/mkdocs_hooks.py.
-# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True` within line.
+# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True, slots=True` within line.
 @dataclass(**_dataclass_options)
 class ShInputConfig:
     """Sh handler configuration."""
@@ -217,10 +283,10 @@ class ShInputConfig:
     @classmethod
     def from_data(cls, **data: Any) -> Self:
         """Create an instance from a dictionary."""
-        return cls(**cls.coerce(**data))
+        return _from_data(cls, data)
 
 
-# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True` within line.
+# YORE: EOL 3.9: Replace `**_dataclass_options` with `frozen=True, kw_only=True, slots=True` within line.
 @dataclass(**_dataclass_options)
 class ShConfig(ShInputConfig):  # type: ignore[override,unused-ignore]
     """Sh handler configuration."""
@@ -232,4 +298,4 @@ class ShConfig(ShInputConfig):  # type: ignore[override,unused-ignore]
     @classmethod
     def coerce(cls, **data: Any) -> MutableMapping[str, Any]:
         """Coerce data."""
-        return super().coerce(**data)
+        return super(ShConfig, cls).coerce(**data)  # noqa: UP008
@@ -111,7 +111,8 @@ class ShHandler(BaseHandler):
                 raise CollectionError(
                     f"Could not find symbol {repr(name)} in script {script_path}"
                 )
-            ret["file"] = root["file"]
+            # The parsed tree is cached, do not modify it.
+            ret = {**ret, "file": root["file"]}
         else:
             ret = root
         return ret
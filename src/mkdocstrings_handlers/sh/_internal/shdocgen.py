@@ -2,10 +2,13 @@
 import argparse
 import json
 import logging
+import os
 import re
+import sys
+from collections import defaultdict
 from pathlib import Path
 from pprint import pprint
-from typing import Any, Callable, Dict, List, Optional, Set, TextIO, Union
+from typing import Any, Callable, Dict, List, Optional, Set, TextIO, Tuple, Union
 
 log = logging.getLogger(__name__)
 
@@ -70,73 +73,122 @@ KNOWN_TAGS: Dict[str, Set[str]] = dict(
         """.split()
     ),
 )
+# All keys allowed in a node of the given type.
+_ALLOWED_TAGS: Dict[str, Set[str]] = {
+    node_type: tags | COMMON_TAGS for node_type, tags in KNOWN_TAGS.items()
+}
 
-REGEX_CACHE: Dict[str, re.Pattern] = {}
+# Parsed scripts, keyed by the parse_script() arguments.
+# The value is (st_mtime_ns, st_size, root) of the file when it was parsed.
+_PARSE_CACHE: Dict[tuple, Tuple[int, int, dict]] = {}
+# Name -> nodes in traversal order of each root in _PARSE_CACHE, keyed by id() of the root.
+# An entry is removed together with its root, so the id() is not reused while it exists.
+_NAME_INDEX: Dict[int, Dict[str, List[dict]]] = {}
+
+# -l --longarg <var> Description
+# --longarg=<var> Description
+# [$1] description
+# $1 description
+_ARGOPT_RE = re.compile(
+    r"^\s*(?P<code>(--?\S+(=\S+|\s*<\w+>)?\s+)+|\[?\$\S+(\s*<\w+>)?)\s*(?P<description>.*)$",
+    re.DOTALL,
+)
+_SETENV_RE = re.compile(r"^\s*(\S+)\s*(.*)$", re.DOTALL)
+_SEE_RE = re.compile(r"^(\w+)(.*?)\s*$", re.DOTALL)
+_URL_RE = re.compile(r"^https?://\S+\s*$", re.DOTALL)
+# One pass over a comment line, dispatched on the name of the last matched group:
+# "# @tag value", "# shellcheck disable=..." or "# SPDX-License-Identifier: ...".
+_LINE_RE = re.compile(
+    r"^#\s@(?P<tag>[a-z]+)\s*(?P<tagval>.*)$"
+    r"|^#\s+shellcheck\s+disable=(?P<shellcheck>.*)$"
+    r"|^#\s+SPDX-License-Identifier:\s+(?P<spdx>.*)$",
+    re.DOTALL,
+)
+# function name()
+# function name
+# name()
+_FUNC_RE = re.compile(
+    r"^(function\s+(?P<function>[a-zA-Z@_]\w+)|(?P<function2>[a-zA-Z@_]\w+)\s*[(][)]).*$",
+    re.DOTALL,
+)
+# : "${variable:=value}"
+# : "${variable=value}"
+# : ${variable:=value}
+# : ${variable=value}
+# variable=
+# declare variable=
+# declare -a variable=
+# readonly variable=
+_VAR_RE = re.compile(
+    r'^(:\s+"?\${(?P<variable>[a-zA-Z_][a-zA-Z_0-9]*):?='
+    r"|(|readonly\s+|declare(\s+-\w+)*\s+)(?P<variable2>[a-zA-Z_][a-zA-Z_0-9]*)=).*$",
+    re.DOTALL,
+)
 
 
-def re_search(patstr: str, txt: str, opts=re.DOTALL) -> Optional[re.Match]:
-    """Like re.search, but cache regexes compilation. I wonder if this is actually worth it."""
-    pat = REGEX_CACHE.get(patstr)
-    if not pat:
-        pat = re.compile(patstr, opts)
-        REGEX_CACHE[patstr] = pat
-    return pat.search(txt)
+def _strip_comment(line: str) -> str:
+    """Remove the leading # and one optional whitespace from a comment line."""
+    line = line[1:]
+    return line[1:] if line[:1].isspace() else line
+
+
+def _split_arg_option(key: str, elem: str) -> dict:
+    mopt = _ARGOPT_RE.search(elem)
+    if mopt:
+        return {
+            "code": mopt.group("code").strip(),
+            "description": mopt.group("description") or "",
+        }
+    log.error(f"invalid @{key}: {repr(elem)}")
+    return {"code": " ", "description": elem}
 
 
 def _convert_tag_arg_option(cur):
     # Convert optinos and arg into code part and description part.
     for key in ["option", "arg"]:
-        for idx, elem in enumerate(cur.get(key, [])):
-            # -l --longarg <var> Description
-            # --longarg=<var> Description
-            # [$1] description
-            # $1 description
-            mopt = re_search(
-                r"^\s*(?P<code>(--?\S+(=\S+|\s*<\w+>)?\s+)+|\[?\$\S+(\s*<\w+>)?)\s*(?P<description>.*)$",
-                elem,
-            )
-            if mopt:
-                cur[key][idx] = dict(
-                    code=mopt.group("code").strip(),
-                    description=mopt.group("description") or "",
-                )
-            else:
-                log.error(f"invalid @{key}: {repr(elem)}")
-                cur[key][idx] = dict(code=" ", description=cur[key][idx])
+        if key in cur:
+            cur[key] = [_split_arg_option(key, elem) for elem in cur[key]]
+
+
+def _split_set_env(key: str, elem: str) -> dict:
+    mopt = _SETENV_RE.search(elem)
+    if mopt:
+        return {
+            "code": mopt.group(1).strip(),
+            "description": mopt.group(2) or "",
+        }
+    log.warning(f"invalid @{key}: {repr(elem)}")
+    return {"code": "", "description": elem}
 
 
 def _convert_tag_set_env(cur):
     for key in ["set", "env"]:
-        for idx, elem in enumerate(cur.get(key, [])):
-            mopt = re_search(r"^\s*(\S+)\s*(.*)$", elem)
-            if mopt:
-                cur[key][idx] = dict(
-                    code=mopt.group(1).strip(),
-                    description=mopt.group(2) or "",
-                )
-            else:
-                log.warning(f"invalid @{key}: {repr(elem)}")
-                cur[key][idx] = dict(code="", description=cur[key][idx])
+        if key in cur:
+            cur[key] = [_split_set_env(key, elem) for elem in cur[key]]
 
 
 def _convert_see(cur, allkeys: Set[str]):
     for idx, elem in enumerate(cur.get("see", [])):
-        m = re_search(r"^(\w+)(.*?)\s*$", elem)
+        m = _SEE_RE.search(elem)
         if m and m[1] in allkeys:
             # If the stuff in "see" references one of things we know about, make it an URL.
             cur["see"][idx] = f"[{m[1]}](#{m[1]}){m[2]}"
         else:
             # If "see" is an url, make it clickable automatically.
-            m = re_search(r"^https?://\S+\s*$", elem)
+            m = _URL_RE.search(elem)
             if m:
                 cur["see"][idx] = f"[{elem}]({elem})"
 
 
 def traverse(root: dict, cb: Callable[[dict], Any]):
-    for i in root["data"]:
+    # Pre-order depth first, with an explicit stack instead of recursion.
+    # Children are pushed reversed, so they are visited in document order.
+    stack = root["data"][::-1]
+    while stack:
+        i = stack.pop()
         cb(i)
         if i.get("data"):
-            traverse(i, cb)
+            stack.extend(reversed(i["data"]))
 
 
 def parse_stream(
@@ -167,104 +219,105 @@ def parse_stream(
     Tags geven twice or more just result in more elements in the array or them.
     Each level has "type": file/section/variable/function.
     """
-    root: dict = dict(type="file", file=file, data=[])
+    root: dict = {"type": "file", "file": file, "data": []}
     parents: List[dict] = [root]  # Section nesting.
-    cur: dict = {}  # Current element.
+    allnames: Set[str] = set()  # Names of all sections, functions and variables in the tree.
+    # Current element. Tags are appended to lists, so a defaultdict saves setdefault() calls.
+    cur: Dict[str, Any] = defaultdict(list)
     cur_tag: Optional[str] = None  # Last seen @tag
-    for lineno, line in enumerate(stream):
-        if line and line[-1] == "\n":
-            line = line[:-1]
+    includere = re.compile(includeregex, re.DOTALL) if includeregex else None
+    excludere = re.compile(excluderegex, re.DOTALL) if excluderegex else None
+    # Read everything at once. Split on "\n" only, like iterating over the stream does,
+    # str.splitlines() would also split on form feeds and other separators.
+    lines = stream.read().split("\n")
+    if not lines[-1]:
+        # Trailing newline or empty stream.
+        lines.pop()
+    for lineno, line in enumerate(lines):
         if line and line[-1] == "\r":
             line = line[:-1]
         # If the line does not start with #, it is the end.
-        if line.startswith("#"):
-            # If the line looks like a beginning of a tag.
-            m = re_search(r"^#\s@([a-z]+)\s*(.*)$", line)
-            if m:
-                cur_tag = m[1]
-                # @section and @type implies the type
-                if cur_tag in ["section", "file", "endsection"]:
-                    cur["type"] = cur_tag
-                    # File has no newline on the end, cleanup.
-                    if cur_tag == "file" and m[2].strip():
-                        # Overwrite file name if not empty.
-                        cur["file"] = m[2]
-                        cur["line"] = lineno
-                    elif cur_tag == "section":
-                        # Clean up desription, it comes after.
-                        cur["description"] = []
-                        # Extract name of @section <this is name>
-                        cur["name"] = m[2]
-                        cur["file"] = file
-                        cur["line"] = lineno
+        if line and line[0] == "#":
+            m = _LINE_RE.match(line)
+            if m is not None:
+                kind = m.lastgroup
+                if kind == "tagval":
+                    # The line looks like a beginning of a tag.
+                    # Tags are used as dictionary keys, intern them.
+                    cur_tag = sys.intern(m["tag"])
+                    # @section and @type implies the type
+                    if cur_tag in ["section", "file", "endsection"]:
+                        cur["type"] = cur_tag
+                        # File has no newline on the end, cleanup.
+                        if cur_tag == "file" and m["tagval"].strip():
+                            # Overwrite file name if not empty.
+                            cur["file"] = m["tagval"]
+                            cur["line"] = lineno
+                        elif cur_tag == "section":
+                            # Clean up desription, it comes after.
+                            cur["description"] = []
+                            # Extract name of @section <this is name>
+                            cur["name"] = m["tagval"]
+                            cur["file"] = file
+                            cur["line"] = lineno
+                        cur_tag = None
+                    else:
+                        cur[cur_tag].append(m["tagval"] + "\n")
+                elif kind == "shellcheck":
+                    # Detect shellcheck lines.
+                    cur["shellcheck"].extend(
+                        "SC" + x if x.isdigit() else x
+                        for x in m["shellcheck"].strip().split(",")
+                    )
                     cur_tag = None
                 else:
-                    cur.setdefault(cur_tag, []).append(m[2] + "\n")
-                continue
-            # Detect shellcheck lines.
-            m = re_search(r"^#\s+shellcheck\s+disable=(.*)$", line)
-            if m:
-                cur.setdefault("shellcheck", []).extend(
-                    "SC" + x if x.isdigit() else x
-                    for x in m.group(1).strip().split(",")
-                )
-                cur_tag = None
-                continue
-            # Detect SPDX lines.
-            m = re_search(r"^#\s+SPDX-License-Identifier:\s+(.*)$", line)
-            if m:
-                cur.setdefault("SPDX-License-Identifier", []).append(m.group(1))
-                cur_tag = None
+                    # Detect SPDX lines.
+                    cur["SPDX-License-Identifier"].append(m["spdx"])
+                    cur_tag = None
                 continue
             # If all stars align, append the string to the last tag element seen.
-            line = re.sub(r"^#\s?(.*?)\n?$", r"\1", line)
-            if cur and cur_tag is not None and len(cur.get(cur_tag, [])):
-                cur[cur_tag][-1] += "\n" + line
-                continue
+            line = _strip_comment(line)
+            if cur_tag is not None:
+                lst = cur.get(cur_tag)
+                if lst:
+                    lst[-1] += "\n" + line
+                    continue
             # Append free lines to description
-            if cur.get("description"):
-                cur["description"][-1] += "\n" + line
+            lst = cur.get("description")
+            if lst:
+                lst[-1] += "\n" + line
             else:
                 cur["description"] = [line]
             continue
         else:
             # Line does not start with #
+            if not cur and not includere:
+                # Plain code line with no documentation before it, nothing to do.
+                continue
             # Try to detect the type depending on the next line after description.
             # I.e. is it a variable or a function?
-            if (cur and "type" not in cur) or includeregex:
-                regexes = [
-                    # function name()
-                    # function name
-                    r"^function\s+(?P<function>[a-zA-Z@_]\w+).*$",
-                    # name()
-                    r"^(?P<function>[a-zA-Z@_]\w+)\s*[(][)].*$",
-                    # : "${variable:=value}"
-                    # : "${variable=value}"
-                    # : ${variable:=value}
-                    # : ${variable=value}
-                    r'^:\s+"?\${(?P<variable>[a-zA-Z_][a-zA-Z_0-9]*):?=.*$',
-                    # variable=
-                    # declare variable=
-                    # declare -a variable=
-                    # readonly variable=
-                    r"^(|readonly\s+|declare(\s+-\w+)*\s+)(?P<variable>[a-zA-Z_][a-zA-Z_0-9]*)=.*$",
-                ]
-                for rgx in regexes:
-                    m = re_search(rgx, line)
+            if (cur and "type" not in cur) or includere:
+                m = _FUNC_RE.search(line)
+                if m:
+                    type = "function"
+                    name = sys.intern(m["function"] or m["function2"])
+                else:
+                    m = _VAR_RE.search(line)
                     if m:
-                        type = (
-                            "function" if m.groupdict().get("function") else "variable"
-                        )
-                        name = m[type]
-                        _convert_tag_arg_option(cur)
-                        _convert_tag_set_env(cur)
-                        if cur or (includeregex and re_search(includeregex, name)):
-                            cur.update(
-                                dict(type=type, name=name, file=file, line=lineno)
-                            )
-                        break
+                        type = "variable"
+                        name = sys.intern(m["variable"] or m["variable2"])
+                if m:
+                    _convert_tag_arg_option(cur)
+                    _convert_tag_set_env(cur)
+                    if cur or (includere and includere.search(name)):
+                        cur["type"] = type
+                        cur["name"] = name
+                        cur["file"] = file
+                        cur["line"] = lineno
             # If type was set, append to the result.
             if "type" in cur:
+                # Store a plain dict in the tree.
+                cur = dict(cur)
                 if cur["type"] == "file":
                     # Just update the root.
                     root.update(cur)
@@ -279,38 +332,33 @@ def parse_stream(
                         parents.pop()
                     parents[-1]["data"].append(cur)
                     parents.append(cur)
+                    if cur["name"]:
+                        allnames.add(cur["name"])
                 elif cur["type"] in ["function", "variable"]:
-                    if not excluderegex or not re_search(excluderegex, cur["name"]):
+                    if not excludere or not excludere.search(cur["name"]):
                         # It's a function or a variable - added to current section.
                         parents[-1]["data"].append(cur)
+                        allnames.add(cur["name"])
             cur_tag = None
-            cur = {}
+            cur = defaultdict(list)
     # Some sanity.
     assert len(parents) != 0, f"Too many @endsection: {len(parents)}"
     assert root["type"] == "file"
     assert isinstance(root["file"], str), f"top level file is not a string {root}"
 
-    def check_node(x):
+    def finish_node(x):
         assert isinstance(x["type"], str)
         assert isinstance(x["name"], str)
         assert x["type"] in ["function", "variable", "file", "section"]
         assert isinstance(x.get("file", ""), str)
         assert isinstance(x.get("data", []), list)
+        _convert_see(x, allnames)
+        # Warn about unknown keys.
+        for k, v in x.items():
+            if k not in _ALLOWED_TAGS[x["type"]]:
+                log.warning(f"Unknown '@{k} {repr(v)}' in {x['type']} {repr(x['name'])}")
 
-    traverse(root, check_node)
-    # Create a list of all possible names.
-    allnames = set()
-    traverse(root, lambda x: x.get("name") and allnames.add(x["name"]))
-    traverse(root, lambda x: _convert_see(x, allnames))
-    # Warn about unknown keys.
-    traverse(
-        root,
-        lambda x: [
-            log.warning(f"Unknown '@{k} {repr(v)}' in {x}")
-            for k, v in x.items()
-            if k not in (KNOWN_TAGS[x["type"]] | COMMON_TAGS)
-        ],
-    )
+    traverse(root, finish_node)
     return root
 
 
@@ -320,19 +368,41 @@ def parse_script(
     includeregex: Optional[str] = None,
     excluderegex: Optional[str] = None,
 ):
+    """
+    Parse a shell script file with parse_stream.
+    The result is cached until the file modification time or size changes,
+    so the returned tree is shared between calls and must not be modified.
+    """
+    st = os.stat(script)
+    key = (str(script), filename, includeregex, excluderegex)
+    cached = _PARSE_CACHE.get(key)
+    if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+        return cached[2]
     with open(script) as f:
-        return parse_stream(f, filename or str(script), includeregex, excluderegex)
+        root = parse_stream(f, filename or str(script), includeregex, excluderegex)
+    if cached:
+        del _NAME_INDEX[id(cached[2])]
+    _PARSE_CACHE[key] = (st.st_mtime_ns, st.st_size, root)
+    _NAME_INDEX[id(root)] = _build_name_index(root)
+    return root
 
 
-def find_name(root, name: str, type: Optional[str] = None) -> Optional[dict]:
-    obj = {}
+def _build_name_index(root: dict) -> Dict[str, List[dict]]:
+    index: Dict[str, List[dict]] = {}
+    traverse(root, lambda x: index.setdefault(x["name"], []).append(x))
+    return index
 
-    def findit(x):
-        if x["name"] == name and (not type or x["type"] == type):
-            obj["elem"] = x
 
-    traverse(root, findit)
-    return obj.get("elem")
+def find_name(root, name: str, type: Optional[str] = None) -> Optional[dict]:
+    # Trees from parse_script() are indexed once, others are indexed on each call.
+    index = _NAME_INDEX.get(id(root))
+    if index is None:
+        index = _build_name_index(root)
+    # If the name is duplicated, the last one wins.
+    for x in reversed(index.get(name, [])):
+        if not type or x["type"] == type:
+            return x
+    return None
 
 
 def main():
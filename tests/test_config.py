@@ -0,0 +1,177 @@
+"""Tests for the options and configuration classes."""
+
+from __future__ import annotations
+
+import importlib
+import sys
+from typing import TYPE_CHECKING
+
+import pytest
+
+from mkdocstrings_handlers.sh import ShHandler
+from mkdocstrings_handlers.sh._internal import config
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from pathlib import Path
+    from types import ModuleType
+
+
+@pytest.fixture(name="reload_config")
+def fixture_reload_config(monkeypatch: pytest.MonkeyPatch) -> Iterator[Callable[[str | None], ModuleType]]:
+    """Yield a function reloading the config module with `MKDOCSTRINGS_SH_VALIDATE` set to a value, or unset.
+
+    The original module namespace is restored afterwards, so that other modules
+    keep working with the classes they imported.
+
+    Parameters:
+        monkeypatch: Pytest fixture.
+
+    Yields:
+        A function reloading the config module.
+    """
+    namespace = dict(vars(config))
+
+    def reload(value: str | None) -> ModuleType:
+        if value is None:
+            monkeypatch.delenv("MKDOCSTRINGS_SH_VALIDATE", raising=False)
+        else:
+            monkeypatch.setenv("MKDOCSTRINGS_SH_VALIDATE", value)
+        return importlib.reload(config)
+
+    yield reload
+    vars(config).clear()
+    vars(config).update(namespace)
+
+
+@pytest.fixture(name="validated_config")
+def fixture_validated_config(reload_config: Callable[[str | None], ModuleType]) -> ModuleType:
+    """Return the config module reloaded with Pydantic validation enabled.
+
+    Parameters:
+        reload_config: Pytest fixture.
+
+    Returns:
+        The config module.
+    """
+    pytest.importorskip("pydantic")
+    module = reload_config("1")
+    assert module._validate
+    return module
+
+
+def test_from_data_cache(validated_config: ModuleType) -> None:
+    """Validated instances are shared between equal option bags.
+
+    Parameters:
+        validated_config: Pytest fixture.
+    """
+    options = validated_config.ShOptions.from_data(heading_level=3, extra={"a": [1]})
+    assert validated_config.ShOptions.from_data(extra={"a": [1]}, heading_level=3) is options
+    assert validated_config.ShOptions.from_data(heading_level=4, extra={"a": [1]}) is not options
+
+
+def test_from_data_cache_keeps_types(validated_config: ModuleType) -> None:
+    """Values that compare equal but have different types get different cache keys.
+
+    Parameters:
+        validated_config: Pytest fixture.
+    """
+    key = validated_config._DataKey
+    assert key({"extra": {"a": [1]}}) != key({"extra": {"a": (1,)}})
+    assert key({"extra": {"a": 1}}) != key({"extra": {"a": True}})
+    from_list = validated_config.ShOptions.from_data(extra={"a": [1]})
+    from_tuple = validated_config.ShOptions.from_data(extra={"a": (1,)})
+    assert from_list is not from_tuple
+
+
+def test_from_data_unhashable(validated_config: ModuleType) -> None:
+    """Unhashable data is not cached, but still builds an instance.
+
+    Parameters:
+        validated_config: Pytest fixture.
+    """
+    with pytest.raises(TypeError):
+        validated_config._DataKey({"extra": {"a": bytearray()}})
+    options = validated_config.ShOptions.from_data(extra={"a": bytearray()})
+    assert options.extra == {"a": bytearray()}
+    assert validated_config.ShOptions.from_data(extra={"a": bytearray()}) is not options
+
+
+def test_from_data_invalid(validated_config: ModuleType) -> None:
+    """Validation errors are raised on every call, they are not cached.
+
+    Parameters:
+        validated_config: Pytest fixture.
+    """
+    from pydantic import ValidationError
+
+    for _ in range(2):
+        with pytest.raises(ValidationError):
+            validated_config.ShOptions.from_data(heading_level="x")
+
+
+def test_from_data_defaults() -> None:
+    """Without data, each class returns its own shared default instance."""
+    options = config.ShOptions.from_data()
+    assert config.ShOptions.from_data() is options
+    assert type(options) is config.ShOptions
+    input_options = config.ShInputOptions.from_data()
+    assert input_options is not options
+    assert type(input_options) is config.ShInputOptions
+    handler_config = config.ShConfig.from_data()
+    assert config.ShConfig.from_data() is handler_config
+    assert config.ShInputConfig.from_data() is not handler_config
+
+
+def test_get_options_not_shared_default(tmp_path: Path) -> None:
+    """The handler always passes `extra`, so it never gets the shared default instance and its dicts.
+
+    Parameters:
+        tmp_path: Pytest fixture.
+    """
+    handler = ShHandler(
+        config=config.ShConfig.from_data(),
+        base_dir=tmp_path,
+        theme="material",
+        custom_templates=None,
+        mdx=[],
+        mdx_config={},
+    )
+    options = handler.get_options({})
+    default = type(options).from_data()
+    assert options is not default
+    assert options.extra is not default.extra
+
+
+@pytest.mark.parametrize("value", [None, ""])
+def test_validation_disabled(
+    value: str | None,
+    reload_config: Callable[[str | None], ModuleType],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Without `MKDOCSTRINGS_SH_VALIDATE`, Pydantic is not even imported.
+
+    Parameters:
+        value: Parametrized value of the environment variable.
+        reload_config: Pytest fixture.
+        monkeypatch: Pytest fixture.
+    """
+    for name in list(sys.modules):
+        if name == "pydantic" or name.startswith("pydantic."):
+            monkeypatch.delitem(sys.modules, name)
+    module = reload_config(value)
+    assert not module._validate
+    assert "pydantic" not in sys.modules
+
+
+def test_validation_enabled(reload_config: Callable[[str | None], ModuleType]) -> None:
+    """With `MKDOCSTRINGS_SH_VALIDATE` set, Pydantic is imported and used.
+
+    Parameters:
+        reload_config: Pytest fixture.
+    """
+    pytest.importorskip("pydantic")
+    module = reload_config("1")
+    assert module._validate
+    assert "pydantic" in sys.modules
@@ -0,0 +1,56 @@
+"""Tests for the shell script parser."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+from mkdocstrings_handlers.sh._internal import shdocgen
+
+_examples = Path(__file__).parent.parent / "docs" / "examples"
+
+
+def _names(root: dict) -> list[str]:
+    return [node["name"] for node in root["data"]]
+
+
+def test_parse_script_cache(tmp_path: Path) -> None:
+    """Parsed scripts are reused until the file changes.
+
+    Parameters:
+        tmp_path: Pytest fixture.
+    """
+    script = tmp_path / "script.sh"
+    script.write_text("# @description foo\nfoo() {}\n")
+    root = shdocgen.parse_script(script)
+    assert shdocgen.parse_script(script) is root
+    assert _names(root) == ["foo"]
+
+    # The size changes, so the file is parsed again even if the modification time does not.
+    script.write_text("# @description foo\nfoo() {}\n# @description bar\nbar() {}\n")
+    reparsed = shdocgen.parse_script(script)
+    assert reparsed is not root
+    assert _names(reparsed) == ["foo", "bar"]
+    assert shdocgen.parse_script(script) is reparsed
+
+    # Different regexes are cached separately.
+    excluded = shdocgen.parse_script(script, excluderegex="^b")
+    assert excluded is not reparsed
+    assert _names(excluded) == ["foo"]
+    assert shdocgen.parse_script(script, excluderegex="^b") is excluded
+    script.write_text(script.read_text() + "_qux() {}\n")
+    included = shdocgen.parse_script(script, includeregex="^_")
+    assert _names(included) == ["foo", "bar", "_qux"]
+    assert shdocgen.parse_script(script, includeregex="^_") is included
+    assert _names(shdocgen.parse_script(script)) == ["foo", "bar"]
+
+
+def test_find_name_duplicates() -> None:
+    """The last symbol with a duplicated name wins, unless a type is given."""
+    root = shdocgen.parse_script(_examples / "duplicates.sh")
+    assert shdocgen.find_name(root, "VARIABLE")["type"] == "function"  # type: ignore[index]
+    assert shdocgen.find_name(root, "VARIABLE", "function")["type"] == "function"  # type: ignore[index]
+    assert shdocgen.find_name(root, "VARIABLE", "variable")["type"] == "variable"  # type: ignore[index]
+    assert shdocgen.find_name(root, "VARIABLE", "section") is None
+    assert shdocgen.find_name(root, "NOT_THERE") is None
+    # The shared tree is not modified by lookups.
+    assert "_index" not in root